@@ -22,12 +22,15 @@ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
  SOFTWARE.
 """
 
-from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import subprocess as sp
+import argparse
 import tempfile
+import hashlib
+import json
+import re
 import shutil
 import glob
-import oarg
 import os
 
 #environment variables
@@ -36,22 +39,39 @@ ENV = {
     "MRTDATADIR": "/home/erik/bin/heg/data",
     "PGSHOME": "/home/erik/bin/heg/TOOLKIT_MTD"
 }
+#environment for HEG tools (other commands use the unmodified environment)
+HEG_ENV = dict(os.environ, **ENV)
 
 #command for hdf-tif conversion tool
-CVT_CMD = "/home/erik/bin/heg/bin/resample"
+#(commands must be absolute since HEG tools run in a scratch dir)
+CVT_CMD = os.path.abspath(os.environ.get("HEG_RESAMPLE")
+    or shutil.which("resample") or "/home/erik/bin/heg/bin/resample")
 #command for hdf file stat tool
-STAT_CMD = "/home/erik/bin/heg/bin/hegtool"
+STAT_CMD = os.path.abspath(os.environ.get("HEG_HEGTOOL")
+    or shutil.which("hegtool") or "/home/erik/bin/heg/bin/hegtool")
 STAT_OUT_FILENAME = "HegHdr.hdr"
+#key=value line of stat command output
+STAT_LINE_RE = re.compile(r"^ *(\w+) *= *(.*?) *$", re.MULTILINE)
+#default directory for persistent cache of stat results (empty to disable)
+STAT_CACHE_DIR = os.environ.get("HDF_TO_TIF_STAT_CACHE_DIR", "")
 #command for reprojecting
-WARP_CMD = "/usr/bin/gdalwarp"
-TO_DEL_FP_PATTERNS = [
-    "hegtool.log",
-    "resample.log",
-    STAT_OUT_FILENAME,
+WARP_CMD = os.path.abspath(shutil.which("gdalwarp") or "/usr/bin/gdalwarp")
+#memory (in MB) for warping operations, split among parallel conversions
+WARP_MEM_MB = 1024
+#GDAL raster block cache size (in % of RAM), split among parallel conversions
+GDAL_CACHEMAX_PCT = 25
+#creation options for warped GeoTiff (tiled and losslessly compressed)
+WARP_CREATION_OPTS = [
+    "TILED=YES",
+    "BLOCKXSIZE=512",
+    "BLOCKYSIZE=512",
+    "COMPRESS=DEFLATE",
+    "PREDICTOR=2",
+    "BIGTIFF=IF_SAFER",
 ]
 
 #default configuration parameters for conversion tool
-DEF_CONF = OrderedDict({
+DEF_CONF = {
     "input_filename": "",
     "object_name": "",
     "field_name": "",
@@ -65,7 +85,18 @@ DEF_CONF = OrderedDict({
         "( 0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0 0.0  )",
     "output_filename": "",
     "output_type": "GEO",
-})
+}
+
+#template of configuration of one run in HEG program format
+CONF_TEMPLATE = "\n".join([
+    "BEGIN",
+    "\n".join("{} = {{{}}}".format(k.upper(), k) for k in DEF_CONF),
+    "END",
+    ""
+])
+
+#maximum number of inputs converted in a single call of conversion tool
+MAX_BATCH_SIZE = 32
 
 #specific configurations for MODIS products
 CONFS = {
@@ -80,58 +111,59 @@ CONFS = {
 #supported products
 PRODUCTS = list(CONFS.keys())
 
+#bands mapping for MODIS vegetation indices products
+VI_BANDS = {
+    "ndvi": "250m 16 days NDVI",
+    "evi": "250m 16 days EVI",
+    "vi-quality": "250m 16 days VI Quality",
+    "red": "250m 16 days red reflectance",
+    "nir": "250m 16 days NIR reflectance",
+    "blue": "250m 16 days blue reflectance",
+    "mir": "250m 16 days MIR reflectance",
+    "day": "250m 16 days composite day of the year",
+    "pix-rel": "250m 16 days pixel reliability",
+}
+
 #bands mapping for MODIS products
 BANDS = {
-    "MOD13Q1": {
-        "ndvi": "250m 16 days NDVI",
-        "evi": "250m 16 days EVI",
-        "vi-quality": "250m 16 days VI Quality",
-        "red": "250m 16 days red reflectance",
-        "nir": "250m 16 days NIR reflectance",
-        "blue": "250m 16 days blue reflectance",
-        "mir": "250m 16 days MIR reflectance",
-        "day": "250m 16 days composite day of the year",
-        "pix-rel": "250m 16 days pixel reliability",
-    },
-    "MYD13Q1": {
-        "ndvi": "250m 16 days NDVI",
-        "evi": "250m 16 days EVI",
-        "vi-quality": "250m 16 days VI Quality",
-        "red": "250m 16 days red reflectance",
-        "nir": "250m 16 days NIR reflectance",
-        "blue": "250m 16 days blue reflectance",
-        "mir": "250m 16 days MIR reflectance",
-        "day": "250m 16 days composite day of the year",
-        "pix-rel": "250m 16 days pixel reliability",
-    }
+    "MOD13Q1": VI_BANDS,
+    "MYD13Q1": VI_BANDS,
+}
+
+#field names by (product, band)
+BAND_FIELDS = {
+    (product, band): field
+    for product, bands in BANDS.items() for band, field in bands.items()
 }
 
-def mk_conf_str(conf):
+def mk_conf_str(confs):
     """
-    Formats configuration in HEG program format.
+    Formats configurations of one or more runs in HEG program format.
     """
-    conf_str = "\n".join([
-        "{} = {}".format(k.upper(), v) for k, v in conf.items()
-    ])
-    conf_str = "\n".join([
-        "",
-        "NUM_RUNS = 1",
-        "",
-        "BEGIN",
-        conf_str,
-        "END",
-        ""
-    ])
-    return conf_str
+    return "\n".join(
+        ["", "NUM_RUNS = {}".format(len(confs)), ""]
+        + [CONF_TEMPLATE.format(**conf) for conf in confs])
 
-def mk_conf_file(conf):
+def mk_conf_file(confs):
     """
-    Creates config file in temporary file.
+    Creates config file in memory if possible, else in temporary file.
+    Returns config filepath and in-memory file descriptor (None if on disk).
+    The descriptor must be passed to the conversion command and closed by
+    the caller.
     """
-    tmp_fp = tempfile.mktemp()
-    with open(tmp_fp, "w") as f:
-        print(mk_conf_str(conf), file=f)
-    return tmp_fp
+    conf_bytes = mk_conf_str(confs).encode()
+
+    if hasattr(os, "memfd_create"):
+        fd = os.memfd_create("heg_conf")
+        os.write(fd, conf_bytes)
+        return "/proc/self/fd/{}".format(fd), fd
+
+    fd, tmp_fp = tempfile.mkstemp(suffix=".prm")
+    try:
+        os.write(fd, conf_bytes)
+    finally:
+        os.close(fd)
+    return tmp_fp, None
 
 def error(msg, code=1):
     """
@@ -140,7 +172,18 @@ def error(msg, code=1):
     print("error:", msg)
     exit(code)
 
-def run_convert_cmd(params_fp, verbose=True):
+def check_cmds(warp=True):
+    """
+    Checks that external commands are executable, exiting with error if not.
+    """
+    cmds = [("resample", CVT_CMD), ("hegtool", STAT_CMD)]
+    if warp:
+        cmds.append(("gdalwarp", WARP_CMD))
+    for name, cmd in cmds:
+        if not os.access(cmd, os.X_OK):
+            error("{} is not executable at '{}'".format(name, cmd))
+
+def run_convert_cmd(params_fp, pass_fds=(), work_dir=None, verbose=True):
     """
     Wrapper for conversion command.
     """
@@ -149,10 +192,12 @@ def run_convert_cmd(params_fp, verbose=True):
         "-p",
         params_fp
     ]
-    proc = sp.run(cmd, stdout=None if verbose else sp.PIPE, check=True)
+    out = None if verbose else sp.DEVNULL
+    proc = sp.run(cmd, stdout=out, stderr=out, check=True,
+        pass_fds=pass_fds, cwd=work_dir, env=HEG_ENV)
     return proc
 
-def run_stat_cmd(inp_fp, verbose=True):
+def run_stat_cmd(inp_fp, work_dir=None, verbose=True):
     """
     Wrapper for stat command.
     """
@@ -161,55 +206,145 @@ def run_stat_cmd(inp_fp, verbose=True):
         "-h",
         inp_fp
     ]
-    proc = sp.run(cmd, stdout=None if verbose else sp.PIPE, check=True)
+    out = None if verbose else sp.DEVNULL
+    proc = sp.run(cmd, stdout=out, stderr=out, check=True,
+        cwd=work_dir, env=HEG_ENV)
     return proc
 
-def run_warp_cmd(inp_fp, out_fp, proj, verbose=True):
+def run_warp_cmd(inp_fp, out_fp, proj, n_jobs=1, verbose=True):
     """
     Wrapper for reprojection command.
+    Threads and memory are split among n_jobs conversions running in parallel.
     """
+    if n_jobs > 1:
+        num_threads = str(max(1, (os.cpu_count() or 1)//n_jobs))
+    else:
+        num_threads = "ALL_CPUS"
     cmd = [
         WARP_CMD,
+        "-overwrite",
+        "-multi",
+        "-wo", "NUM_THREADS={}".format(num_threads),
+        "-wm", str(max(1, WARP_MEM_MB//n_jobs)),
+        "--config", "GDAL_CACHEMAX",
+        "{}%".format(max(1, GDAL_CACHEMAX_PCT//n_jobs)),
+        #also compresses output blocks in parallel
+        "--config", "GDAL_NUM_THREADS", num_threads,
+    ]
+    for opt in WARP_CREATION_OPTS:
+        cmd.extend(["-co", opt])
+    cmd.extend([
         inp_fp,
         out_fp,
         "-t_srs",
         proj.upper()
-    ]
-    proc = sp.run(cmd, stdout=None if verbose else sp.PIPE, check=True)
+    ])
+    out = None if verbose else sp.DEVNULL
+    proc = sp.run(cmd, stdout=out, stderr=out, check=True)
     return proc
 
-def stat(inp_fp, verbose=True):
+def run_stat(inp_fp, work_dir=".", verbose=True):
     """
-    Gets information from HDF file.
+    Gets information from HDF file running stat command.
     """
     #running command
-    run_stat_cmd(inp_fp, verbose=verbose)
+    run_stat_cmd(inp_fp, work_dir=work_dir, verbose=verbose)
 
     #parsing output of stat
-    out_fp = STAT_OUT_FILENAME
+    out_fp = os.path.join(work_dir, STAT_OUT_FILENAME)
     with open(out_fp, "r") as f:
+        #tabs are normalized since values go verbatim into HEG config
         text = f.read().replace("\\\n", "").replace("\t", " ")
-    lines = text.split("\n")
-    lines = [l.strip(" ") for l in lines if l.strip(" ")]
     #deleting file with output of command
     #os.remove(out_fp)
 
-    params = {l.split("=")[0].lower(): l.split("=")[1] for l in lines}
+    params = {
+        m.group(1).lower(): m.group(2) for m in STAT_LINE_RE.finditer(text)
+    }
     return params
 
-def hdf_to_tif(inp_fp, out_fp, band, proj, verbose=True):
+def get_stat_cache_fp(cache_dir, inp_fp):
     """
-    Converts hdf to tif file, optionally projecting output.
+    Gets filepath of persistent stat cache entry for input filepath.
     """
-    #updating env variables
-    os.environ.update(ENV)
+    name = hashlib.sha1(inp_fp.encode()).hexdigest() + ".json"
+    return os.path.join(cache_dir, name)
 
-    #getting params of input file
-    params = stat(inp_fp, verbose=verbose)
-    #print("params:", params)
+def load_stat_cache(cache_dir, key):
+    """
+    Loads stat results for key from persistent cache, None if not found.
+    """
+    fp, mtime, size = key
+    cache_fp = get_stat_cache_fp(cache_dir, fp)
+    try:
+        with open(cache_fp, "r") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if entry.get("mtime") != mtime or entry.get("size") != size:
+        return None
+    return entry.get("params")
+
+def save_stat_cache(cache_dir, key, params):
+    """
+    Saves stat results for key in persistent cache.
+    """
+    fp, mtime, size = key
+    cache_fp = get_stat_cache_fp(cache_dir, fp)
+    entry = {"filepath": fp, "mtime": mtime, "size": size, "params": params}
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_fp = tempfile.mkstemp(dir=cache_dir)
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        #atomic so that parallel conversions never see partial entries
+        os.replace(tmp_fp, cache_fp)
+    except OSError:
+        pass
+
+def stat(inp_fp, cache_dir=None, work_dir=".", verbose=True):
+    """
+    Gets information from HDF file.
+    If cache_dir is set (default: STAT_CACHE_DIR), results are cached there
+    by filepath, modification time and size.
+    """
+    if cache_dir is None:
+        cache_dir = STAT_CACHE_DIR
+    if not cache_dir:
+        return run_stat(inp_fp, work_dir=work_dir, verbose=verbose)
+
+    inp_stat = os.stat(inp_fp)
+    key = (os.path.abspath(inp_fp), inp_stat.st_mtime, inp_stat.st_size)
+    params = load_stat_cache(cache_dir, key)
+    if params is None:
+        params = run_stat(inp_fp, work_dir=work_dir, verbose=verbose)
+        save_stat_cache(cache_dir, key, params)
+    return params
+
+def get_umask():
+    """
+    Gets current process umask.
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
 
-    #setting up configuration
-    conf = dict(DEF_CONF)
+def is_up_to_date(inp_fp, out_fp):
+    """
+    Checks if output file exists, is not empty and is newer than input file.
+    """
+    try:
+        out_stat = os.stat(out_fp)
+    except FileNotFoundError:
+        return False
+    inp_stat = os.stat(inp_fp)
+    return out_stat.st_size > 0 and out_stat.st_mtime >= inp_stat.st_mtime
+
+def mk_conf(inp_fp, out_fp, band, params):
+    """
+    Creates configuration for conversion of input file with stat params.
+    """
+    conf = DEF_CONF.copy()
     #input/output filenames
     conf["input_filename"] = inp_fp
     conf["output_filename"] = out_fp
@@ -222,58 +357,227 @@ def hdf_to_tif(inp_fp, out_fp, band, proj, verbose=True):
     conf["object_name"] = params["grid_names"].replace(",", "") + "|"
     #band to use
     product = params["input_shortname"]
-    conf["field_name"] = BANDS.get(product, {}).get(band, band)
+    conf["field_name"] = BAND_FIELDS.get((product, band), band)
+    return conf
 
-    #making configuration file
-    conf_fp = mk_conf_file(conf)
-
-    #calling convert command
-    run_convert_cmd(conf_fp, verbose=verbose)
+def convert(confs, work_dir=None, verbose=True):
+    """
+    Runs conversion command once for one or more configurations.
+    """
+    conf_fp, conf_fd = mk_conf_file(confs)
+    try:
+        run_convert_cmd(conf_fp,
+            pass_fds=() if conf_fd is None else (conf_fd, ),
+            work_dir=work_dir, verbose=verbose)
+    finally:
+        if conf_fd is None:
+            os.remove(conf_fp)
+        else:
+            os.close(conf_fd)
 
-    #reprojecting if required
-    if proj:
-        tmp = tempfile.mktemp()
-        run_warp_cmd(out_fp, tmp, proj, verbose=verbose)
-        shutil.move(tmp, out_fp)
-        #to_del_fp_patterns.extend(["filetable.temp_*", "GetAttrtemp_*", "tmp*"])
+def hdfs_to_tifs(inp_fps, out_fps, band, proj, verbose=True, force=False,
+    n_jobs=1, stat_cache_dir=None):
+    """
+    Converts hdf files to tif files, optionally projecting outputs.
+    All inputs are converted in a single call of the conversion command
+    (falling back to one call per input if it fails).
+    Conversion of an input is skipped if its output is newer than it, unless
+    force is set (band and projection are not checked).
+    n_jobs is the number of hdfs_to_tifs calls running in parallel.
+    stat_cache_dir is passed to stat.
+    HEG tools write auxiliary files to their working directory, so they are
+    run in a scratch directory which is removed at the end.
+    Returns list with exception of each failed input (None if succeeded).
+    """
+    errors = [None]*len(inp_fps)
+    scratch_dir = tempfile.mkdtemp()
+    #files outside of scratch dir to delete at the end
+    to_del_fps = []
+
+    try:
+        #setting up conversions: (index, config, output, temporary output)
+        convs = []
+        for i, (inp_fp, out_fp) in enumerate(zip(inp_fps, out_fps)):
+            if not force and is_up_to_date(inp_fp, out_fp):
+                print("'{}' is up to date, skipping".format(out_fp))
+                continue
+
+            #HEG tools run in scratch dir, so paths must not be relative
+            inp_fp = os.path.abspath(inp_fp)
+            out_fp = os.path.abspath(out_fp)
+            try:
+                #getting params of input file
+                params = stat(inp_fp, cache_dir=stat_cache_dir,
+                    work_dir=scratch_dir, verbose=verbose)
+                #output is written next to output filepath and only moved
+                #there on success, so failed conversions never look up to date
+                fd, tmp_out_fp = tempfile.mkstemp(suffix=".tif",
+                    dir=os.path.dirname(out_fp))
+                os.close(fd)
+                to_del_fps.extend([tmp_out_fp, tmp_out_fp + ".met"])
+                #if reprojecting, HEG output is another intermediate file
+                if proj:
+                    fd, heg_out_fp = tempfile.mkstemp(suffix=".tif",
+                        dir=os.path.dirname(out_fp))
+                    os.close(fd)
+                    to_del_fps.extend([heg_out_fp, heg_out_fp + ".met"])
+                else:
+                    heg_out_fp = tmp_out_fp
+                conf = mk_conf(inp_fp, heg_out_fp, band, params)
+            except Exception as e:
+                errors[i] = e
+                continue
+            convs.append((i, conf, out_fp, tmp_out_fp))
+
+        #calling convert command once for all inputs
+        try:
+            if convs:
+                convert([conv[1] for conv in convs],
+                    work_dir=scratch_dir, verbose=verbose)
+        except Exception as e:
+            #converting inputs one by one to know which ones failed
+            if len(convs) == 1:
+                errors[convs[0][0]] = e
+            else:
+                for i, conf, out_fp, tmp_out_fp in convs:
+                    try:
+                        convert([conf], work_dir=scratch_dir, verbose=verbose)
+                    except Exception as e:
+                        errors[i] = e
+
+        for i, conf, out_fp, tmp_out_fp in convs:
+            if errors[i] is not None:
+                continue
+            try:
+                #reprojecting if required
+                if proj:
+                    run_warp_cmd(conf["output_filename"], tmp_out_fp, proj,
+                        n_jobs=n_jobs, verbose=verbose)
+                #mkstemp creates files readable only by owner
+                os.chmod(tmp_out_fp, 0o666 & ~get_umask())
+                os.replace(tmp_out_fp, out_fp)
+            except Exception as e:
+                errors[i] = e
+    finally:
+        #deleting unwanted files, also if conversion failed
+        for fp in to_del_fps:
+            try:
+                os.unlink(fp)
+            except FileNotFoundError:
+                pass
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    return errors
+
+def hdf_to_tif(inp_fp, out_fp, band, proj, verbose=True, force=False,
+    n_jobs=1, stat_cache_dir=None):
+    """
+    Converts hdf to tif file, optionally projecting output.
+    See hdfs_to_tifs, raises exception if conversion fails.
+    """
+    err = hdfs_to_tifs([inp_fp], [out_fp], band, proj, verbose=verbose,
+        force=force, n_jobs=n_jobs, stat_cache_dir=stat_cache_dir)[0]
+    if err is not None:
+        raise err
 
-    #deleting unwanted files
-    to_del_fp_patterns = list(TO_DEL_FP_PATTERNS)
-    to_del_fp_patterns.extend([conf_fp, out_fp + ".met", "filetable.temp_*"])
-    for pattern in to_del_fp_patterns:
-        for fp in glob.glob(pattern):
-            os.remove(fp)
+def get_out_fp(inp_fp):
+    """
+    Gets default output filepath for input filepath.
+    """
+    if not inp_fp[-4:].lower() == ".hdf":
+        return inp_fp + ".tif"
+    return inp_fp[:-4] + ".tif"
 
 def main():
     #command-line args
-    inp_fp = oarg.Oarg("-i --input", "", "input filepath", 0)
-    band = oarg.Oarg("-b --band", "", "band name", 1)
-    out_fp = oarg.Oarg("-o --output", "", "output filepath", 2)
-    silence = oarg.Oarg("-s --silence", False, "suppress convert tool output")
-    proj = oarg.Oarg("-p --projection", "", "warp from geo to EPSG:XXXX")
-    hlp = oarg.Oarg("-h --help", False, "this help message")
-    oarg.parse()
-
-    #help message
-    if hlp.val:
-        oarg.describe_args("options:", def_val=True)
-        return
+    parser = argparse.ArgumentParser(
+        description="HDF to GeoTiff conversion tool.")
+    parser.add_argument("-i", "--input", nargs="+", default=[],
+        help="input filepath(s)")
+    parser.add_argument("-g", "--glob", default="",
+        help="glob pattern of input filepaths")
+    parser.add_argument("-b", "--band", required=True, help="band name")
+    parser.add_argument("-o", "--output", nargs="*", default=[],
+        help="output filepath(s) (default: input filepath with .tif)")
+    parser.add_argument("-s", "--silence", action="store_true",
+        help="suppress convert tool output")
+    parser.add_argument("-p", "--projection", default="",
+        help="warp from geo to EPSG:XXXX")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+        help="number of parallel conversions")
+    parser.add_argument("-f", "--force", action="store_true",
+        help="convert even if output is newer than input"
+            " (needed if band or projection changed)")
+    parser.add_argument("-c", "--stat-cache-dir", default=STAT_CACHE_DIR,
+        help="directory to cache HDF file information in between runs"
+            " (default: $HDF_TO_TIF_STAT_CACHE_DIR, disabled if empty)")
+    args = parser.parse_args()
 
     #checking args validity
-    if not inp_fp.found:
-        error("must provide input filepath (use --help)")
-    if not band.found:
-        error("must provide band (use --help)")
-    if not out_fp.found:
-        if not inp_fp.val[-4:].lower() == ".hdf":
-            out_fp = inp_fp.val + ".tif"
-        else:
-            out_fp = inp_fp.val[:-4] + ".tif"
-    else:
-        out_fp = out_fp.val
+    inp_fps = list(args.input)
+    if args.glob:
+        glob_fps = sorted(glob.glob(args.glob))
+        if not glob_fps:
+            error("no files match '{}'".format(args.glob))
+        inp_fps.extend(glob_fps)
+    if not inp_fps:
+        error("must provide input filepath or glob (use --help)")
+    if args.output and len(args.output) != len(inp_fps):
+        error("number of output filepaths must match number of inputs")
+    out_fps = args.output or [get_out_fp(fp) for fp in inp_fps]
+    #removing repeated inputs, keeping order
+    fps = {}
+    for inp_fp, out_fp in zip(inp_fps, out_fps):
+        entry = fps.setdefault(os.path.abspath(inp_fp), (inp_fp, out_fp))
+        if os.path.abspath(entry[1]) != os.path.abspath(out_fp):
+            error("input '{}' given with different outputs".format(inp_fp))
+    inp_fps = [inp_fp for inp_fp, out_fp in fps.values()]
+    out_fps = [out_fp for inp_fp, out_fp in fps.values()]
+    if len(set(map(os.path.abspath, out_fps))) != len(out_fps):
+        error("different inputs must not have the same output filepath")
+    if args.jobs < 1:
+        error("number of jobs must be at least 1")
+    check_cmds(warp=bool(args.projection))
+    verbose = not args.silence
+
+    #splitting inputs in batches, each converted with one call of HEG
+    n_jobs = min(args.jobs, len(inp_fps))
+    batch_size = min(MAX_BATCH_SIZE, -(-len(inp_fps)//n_jobs))
+    batches = [
+        (inp_fps[i:i+batch_size], out_fps[i:i+batch_size])
+        for i in range(0, len(inp_fps), batch_size)
+    ]
 
-    #converting
-    hdf_to_tif(inp_fp.val, out_fp, band.val, proj.val, not silence.val)
+    #converting batches, in parallel if requested
+    conv_kwargs = {
+        "band": args.band,
+        "proj": args.projection,
+        "verbose": verbose,
+        "force": args.force,
+        "n_jobs": n_jobs,
+        "stat_cache_dir": args.stat_cache_dir,
+    }
+    if n_jobs == 1:
+        results = (hdfs_to_tifs(inp_batch, out_batch, **conv_kwargs)
+            for inp_batch, out_batch in batches)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [
+                executor.submit(hdfs_to_tifs, inp_batch, out_batch,
+                    **conv_kwargs)
+                for inp_batch, out_batch in batches
+            ]
+            results = [future.result() for future in futures]
+
+    #reporting errors
+    n_errors = 0
+    for (inp_batch, out_batch), errors in zip(batches, results):
+        for inp_fp, err in zip(inp_batch, errors):
+            if err is not None:
+                print("error converting '{}': {}".format(inp_fp, err))
+                n_errors += 1
+    if n_errors:
+        error("{} of {} conversions failed".format(n_errors, len(inp_fps)))
 
 if __name__ == "__main__":
     main()